@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Atomic file replacement for the catalog files
+Data is written to a temporary file in the target directory and renamed over
+the original, so readers such as server.py clients see either the old file or
+the new one, never a half-written one.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+@contextmanager
+def atomic_write(path, mode='w', encoding='utf-8'):
+    """Open a temporary file for writing that replaces `path` when the block exits cleanly"""
+    target_dir = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=target_dir)
+    try:
+        # mkstemp creates the file as 0600; keep the permissions of the file being replaced
+        try:
+            file_mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            file_mode = 0o666 & ~umask
+        os.chmod(tmp_path, file_mode)
+
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
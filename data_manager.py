@@ -3,11 +3,12 @@
 Quick test and backup system for earthquake data
 """
 
-import json
 import os
 import shutil
 from datetime import datetime
 
+import ndjson_reader
+
 def backup_data():
     """Create a backup of the current data file"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,6 +24,31 @@ def backup_data():
         print("❌ No data file found to backup")
         return None
 
+def _shard_stats(records):
+    """Partial statistics for one shard of the data file"""
+    earthquake_count = 0
+    years = set()
+    mag_count = 0
+    mag_sum = 0.0
+    mag_min = mag_max = None
+    
+    for eq_data in records:
+        earthquake_count += 1
+        
+        # Extract year
+        if eq_data['time'] is not None:
+            years.add(datetime.fromtimestamp(eq_data['time'] / 1000).year)
+        
+        # Extract magnitude
+        mag = eq_data['mag']
+        if mag is not None:
+            mag_count += 1
+            mag_sum += mag
+            mag_min = mag if mag_min is None else min(mag_min, mag)
+            mag_max = mag if mag_max is None else max(mag_max, mag)
+    
+    return earthquake_count, years, mag_count, mag_sum, mag_min, mag_max
+
 def get_data_stats():
     """Get statistics about the current data"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -34,29 +60,27 @@ def get_data_stats():
     
     earthquake_count = 0
     years = set()
-    magnitudes = []
+    mag_count = 0
+    mag_sum = 0.0
+    mags_min = []
+    mags_max = []
     
     try:
-        with open(data_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    eq_data = json.loads(line)
-                    earthquake_count += 1
-                    
-                    # Extract year
-                    if 'time' in eq_data:
-                        year = datetime.fromtimestamp(eq_data['time'] / 1000).year
-                        years.add(year)
-                    
-                    # Extract magnitude
-                    if 'mag' in eq_data and eq_data['mag'] is not None:
-                        magnitudes.append(eq_data['mag'])
+        # Each shard is reduced in a worker process; only the partial results are merged here
+        partials, _ = ndjson_reader.aggregate(data_file, _shard_stats, fields=['time', 'mag'])
+        for count, shard_years, shard_mag_count, shard_mag_sum, shard_min, shard_max in partials:
+            earthquake_count += count
+            years |= shard_years
+            mag_count += shard_mag_count
+            mag_sum += shard_mag_sum
+            if shard_mag_count:
+                mags_min.append(shard_min)
+                mags_max.append(shard_max)
         
-        if magnitudes:
-            avg_mag = sum(magnitudes) / len(magnitudes)
-            max_mag = max(magnitudes)
-            min_mag = min(magnitudes)
+        if mag_count:
+            avg_mag = mag_sum / mag_count
+            max_mag = max(mags_max)
+            min_mag = min(mags_min)
         else:
             avg_mag = max_mag = min_mag = 0
         
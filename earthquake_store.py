@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+SQLite catalog backend for earthquake data
+Stores the catalog in a WAL-mode database so the updater can upsert new rows
+in a single transaction while readers keep getting consistent snapshots.
+data.json is exported from the database on demand. The size, mtime and hash
+of the last data.json the database saw are kept in the meta table, so edits
+made to the file by other writers are imported before it is overwritten.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from atomic_file import atomic_write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS earthquakes (
+    id TEXT PRIMARY KEY,
+    time INTEGER,
+    latitude REAL,
+    longitude REAL,
+    depth REAL,
+    mag REAL,
+    updated TEXT,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_earthquakes_time ON earthquakes(time);
+CREATE INDEX IF NOT EXISTS idx_earthquakes_mag ON earthquakes(mag);
+CREATE INDEX IF NOT EXISTS idx_earthquakes_latlon ON earthquakes(latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_earthquakes_seq ON earthquakes(seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO earthquakes (id, time, latitude, longitude, depth, mag, updated, seq, record)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    time = excluded.time,
+    latitude = excluded.latitude,
+    longitude = excluded.longitude,
+    depth = excluded.depth,
+    mag = excluded.mag,
+    updated = excluded.updated,
+    seq = excluded.seq,
+    record = excluded.record
+WHERE earthquakes.record != excluded.record
+"""
+
+def default_db_path():
+    """Return the database path from EARTHQUAKE_DB, or None if the backend is disabled"""
+    return os.environ.get('EARTHQUAKE_DB') or None
+
+def earthquake_id(eq_data):
+    """Return the catalog ID of an earthquake record"""
+    # Use a combination of time, lat, lon as ID if no ID exists
+    return eq_data.get('id', f"{eq_data.get('time', '')}_{eq_data.get('latitude', '')}_{eq_data.get('longitude', '')}")
+
+def connect(db_path):
+    """Open the catalog database in WAL mode, creating the schema if needed"""
+    # isolation_level=None lets us issue BEGIN/COMMIT explicitly
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+def count_earthquakes(conn):
+    """Return the number of earthquakes in the catalog"""
+    return conn.execute('SELECT COUNT(*) FROM earthquakes').fetchone()[0]
+
+def last_seq(conn):
+    """Return the sequence number of the most recent change in the catalog"""
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM earthquakes').fetchone()[0]
+
+def get_meta(conn, key, default=None):
+    """Return a value from the meta table"""
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+def _set_meta(conn, key, value):
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+def stream_floor(conn):
+    """
+    Return the sequence number up to which changes are not published as live events.
+    Rows written by the initial seed sit at or below it, so the event stream skips them.
+    """
+    return int(get_meta(conn, 'stream_floor', 0))
+
+def is_seeded(conn):
+    """Return True once the catalog has been seeded from data.json (or marked as not needing it)"""
+    return get_meta(conn, 'seeded') == '1'
+
+def mark_seeded(conn):
+    """Record that there is nothing to seed, so the updater never imports data.json later"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _set_meta(conn, 'seeded', 1)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def _upsert_rows(conn, earthquakes):
+    """Upsert rows inside an open transaction and return (inserted, updated) counts"""
+    inserted = updated = 0
+    seq = last_seq(conn)
+    for earthquake in earthquakes:
+        eq_id = earthquake_id(earthquake)
+        exists = conn.execute('SELECT 1 FROM earthquakes WHERE id = ?', (eq_id,)).fetchone()
+        seq += 1
+        cursor = conn.execute(UPSERT_SQL, (
+            eq_id,
+            earthquake.get('time'),
+            earthquake.get('latitude'),
+            earthquake.get('longitude'),
+            earthquake.get('depth'),
+            earthquake.get('mag'),
+            str(earthquake.get('updated', '')),
+            seq,
+            json.dumps(earthquake, separators=(',', ':'), sort_keys=True),
+        ))
+        if cursor.rowcount:
+            if exists:
+                updated += 1
+            else:
+                inserted += 1
+    return inserted, updated
+
+def upsert_earthquakes(conn, earthquakes):
+    """
+    Insert new earthquakes and update revised ones in a single transaction.
+    Rows whose stored record is unchanged are left untouched.
+    Returns (inserted, updated) counts.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        counts = _upsert_rows(conn, earthquakes)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return counts
+
+def changes_since(conn, seq, limit=1000):
+    """Return (seq, record JSON) pairs for rows inserted or revised after the given sequence number"""
+    return conn.execute(
+        'SELECT seq, record FROM earthquakes WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit)
+    ).fetchall()
+
+def _iter_json_lines(json_file_path, errors, digest):
+    """Yield the records of a JSON-lines file, hashing every byte and skipping invalid lines"""
+    with open(json_file_path, 'rb') as f:
+        for line_num, line in enumerate(f, 1):
+            digest.update(line)
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    errors.append((line_num, str(e)))
+
+def _file_signature(json_file_path, sha256=None):
+    """Return 'size mtime_ns sha256' for a file; the hash is computed unless given"""
+    st = os.stat(json_file_path)
+    if sha256 is None:
+        digest = hashlib.sha256()
+        with open(json_file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+    return f"{st.st_size} {st.st_mtime_ns} {sha256}"
+
+def json_changed(conn, json_file_path):
+    """
+    Return True if data.json was changed by another writer since the database last
+    imported or exported it. The file is only hashed when its size or mtime moved,
+    and a touched but identical file just has its signature refreshed.
+    """
+    if not os.path.exists(json_file_path):
+        return False
+    stored = get_meta(conn, 'json_signature')
+    if stored is None:
+        return True
+    size, mtime_ns, sha256 = stored.split(' ')
+    st = os.stat(json_file_path)
+    if f"{st.st_size} {st.st_mtime_ns}" == f"{size} {mtime_ns}":
+        return False
+    signature = _file_signature(json_file_path)
+    if signature.split(' ')[2] != sha256:
+        return True
+    _set_meta(conn, 'json_signature', signature)
+    return False
+
+def import_json(conn, json_file_path, seed=True):
+    """
+    Import a JSON-lines catalog into the database and mark it as seeded.
+    The whole import is one transaction, so readers never see a partially
+    imported catalog. Invalid lines are skipped rather than failing every
+    later run. A seed is history, not news, so the stream floor is moved past
+    it; with seed=False (re-importing edits made by other writers) the changed
+    rows are published as live events.
+    Returns (inserted, updated, errors) where errors lists (line number, message).
+    """
+    errors = []
+    digest = hashlib.sha256()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        inserted, updated = _upsert_rows(conn, _iter_json_lines(json_file_path, errors, digest))
+        if seed:
+            _set_meta(conn, 'stream_floor', last_seq(conn))
+        _set_meta(conn, 'seeded', 1)
+        _set_meta(conn, 'json_signature', _file_signature(json_file_path, digest.hexdigest()))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return inserted, updated, errors
+
+def export_json(conn, json_file_path):
+    """
+    Export the catalog to a JSON-lines file, newest first.
+    The file is written to a temporary path and atomically renamed into place,
+    so readers never see a half-written data.json. Note that this rewrites the
+    whole file; only call it when the catalog actually changed.
+    """
+    count = 0
+    digest = hashlib.sha256()
+    with atomic_write(json_file_path, 'wb') as f:
+        for (record,) in conn.execute('SELECT record FROM earthquakes ORDER BY time DESC'):
+            line = record.encode('utf-8') + b'\n'
+            f.write(line)
+            digest.update(line)
+            count += 1
+    _set_meta(conn, 'json_signature', _file_signature(json_file_path, digest.hexdigest()))
+    return count
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    json_file_path = os.path.join(script_dir, 'data.json')
+    db_path = default_db_path() or os.path.join(script_dir, 'data.sqlite')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'export'
+
+    print("🗄️  Earthquake Catalog Store")
+    print("=" * 40)
+    print(f"📂 Database: {db_path}")
+
+    conn = connect(db_path)
+    if command == 'import':
+        inserted, updated, errors = import_json(conn, json_file_path)
+        for line_num, error in errors:
+            print(f"⚠️  Skipping invalid JSON on line {line_num}: {error}")
+        print(f"📥 Imported {json_file_path}: {inserted} new, {updated} updated")
+    elif command == 'export':
+        count = export_json(conn, json_file_path)
+        print(f"💾 Exported {count} earthquakes to {json_file_path}")
+    else:
+        print(f"❌ Unknown command: {command} (use 'import' or 'export')")
+        sys.exit(1)
+    print(f"📈 Total earthquakes in database: {count_earthquakes(conn)}")
+    print(f"📅 Checked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    conn.close()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Command-line entry point for the earthquake data tools
+Usage: python3 eqdata.py {update,stats,sort,frequency,backup,convert,worker}
+Each subcommand imports only what it needs, so quick commands do not pay for
+requests, pandas or matplotlib. The worker subcommand stays resident and keeps
+the catalog index and HTTP session warm between updates.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+class UpdateWorker:
+    """Run catalog updates while keeping the catalog index and HTTP session in memory"""
+
+    def __init__(self, json_file_path=None, db_path=None):
+        self.json_file_path = json_file_path or os.path.join(script_dir, 'data.json')
+        self.db_path = db_path
+        self.session = None
+        self.existing_index = None
+        self.existing_ids = set()
+        self._catalog_mtime = None
+
+    def _load_catalog(self, updater):
+        """(Re)parse data.json only if it changed on disk since the last load"""
+        try:
+            mtime = os.path.getmtime(self.json_file_path)
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == self._catalog_mtime:
+            return
+        self.existing_index, self.existing_ids = updater.load_existing_data(self.json_file_path)
+        self._catalog_mtime = mtime
+
+    def update(self):
+        """Fetch the latest USGS data and write only what changed"""
+        import update_earthquake_data as updater
+
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+
+        usgs_features = updater.fetch_weekly_usgs_data(self.session)
+        if not usgs_features:
+            print("❌ Failed to fetch new data, keeping existing dataset")
+            return False
+
+        if self.db_path:
+            return updater.update_store(self.db_path, self.json_file_path, usgs_features)
+
+        self._load_catalog(updater)
+        new_earthquakes = updater.select_new_earthquakes(usgs_features, self.existing_ids)
+        if not new_earthquakes:
+            print("ℹ️  No new earthquakes, data.json left as is")
+            return True
+
+        new_index = updater.update_json_file(self.json_file_path, self.existing_index, new_earthquakes)
+        if new_index is None:
+            # IDs of unsaved earthquakes are already in existing_ids, so reload next time
+            self._catalog_mtime = None
+            print("❌ Failed to update data file")
+            return False
+
+        # The rewritten file's index comes back from the write, so nothing is re-parsed
+        self.existing_index = new_index
+        self._catalog_mtime = os.path.getmtime(self.json_file_path)
+        print("🎉 Data update completed successfully!")
+        return True
+
+def cmd_update(args):
+    return UpdateWorker(db_path=args.db).update()
+
+def cmd_worker(args):
+    worker = UpdateWorker(db_path=args.db)
+    print(f"🔁 Update worker started, running every {args.interval} seconds")
+    print("⏹️  Press Ctrl+C to stop")
+    try:
+        while True:
+            print(f"🔄 Updating earthquake data... ({datetime.now().strftime('%H:%M:%S')})")
+            worker.update()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n🛑 Update worker stopped by user")
+    return True
+
+def cmd_stats(args):
+    from data_manager import get_data_stats
+    get_data_stats()
+    return True
+
+def cmd_sort(args):
+    from sort_earthquake_data import sort_earthquake_data
+    return sort_earthquake_data()
+
+def cmd_frequency(args):
+    import Frequency_counter
+    Frequency_counter.main(plot=not args.no_plot)
+    return True
+
+def cmd_backup(args):
+    from data_manager import backup_data
+    return backup_data() is not None
+
+def cmd_convert(args):
+    import json_creator
+    json_creator.main()
+    print("✅ Converted data.csv to data.json")
+    return True
+
+def build_parser():
+    """Build the argument parser for all subcommands"""
+    parser = argparse.ArgumentParser(prog='eqdata', description='Earthquake data tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    db_default = os.environ.get('EARTHQUAKE_DB')
+
+    update = subparsers.add_parser('update', help='fetch the latest weekly USGS data')
+    update.add_argument('--db', default=db_default, help='SQLite catalog path (default: $EARTHQUAKE_DB)')
+    update.set_defaults(func=cmd_update)
+
+    worker = subparsers.add_parser('worker', help='stay resident and update periodically')
+    worker.add_argument('--db', default=db_default, help='SQLite catalog path (default: $EARTHQUAKE_DB)')
+    worker.add_argument('--interval', type=int, default=6 * 60 * 60, help='seconds between updates (default: 6 hours)')
+    worker.set_defaults(func=cmd_worker)
+
+    subparsers.add_parser('stats', help='show dataset statistics').set_defaults(func=cmd_stats)
+    subparsers.add_parser('sort', help='sort data.json newest first').set_defaults(func=cmd_sort)
+
+    frequency = subparsers.add_parser('frequency', help='write daily frequency CSVs and plot')
+    frequency.add_argument('--no-plot', action='store_true', help='only write the CSV files')
+    frequency.set_defaults(func=cmd_frequency)
+
+    subparsers.add_parser('backup', help='back up data.json').set_defaults(func=cmd_backup)
+    subparsers.add_parser('convert', help='convert data.csv to data.json').set_defaults(func=cmd_convert)
+
+    return parser
+
+def main(argv=None):
+    """Parse arguments and run the chosen subcommand"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events broadcaster for live earthquake updates
+A single thread watches the SQLite catalog for newly ingested or revised
+earthquakes and pushes them as small deltas to every connected client.
+Client sockets are multiplexed with selectors, so idle connections cost
+a file descriptor and a small buffer rather than a thread each.
+"""
+
+import selectors
+import socket
+import threading
+import time
+
+import earthquake_store
+
+# Drop clients that fall this far behind instead of buffering without bound
+MAX_PENDING_BYTES = 1024 * 1024
+# Pause before retrying after an error in the loop (e.g. a locked or missing database)
+ERROR_BACKOFF = 5.0
+# Resume replays are queued in batches of this many events, refilled whenever the
+# client's buffer drains below REPLAY_LOW_WATER, so a long backlog never hits the cap
+REPLAY_BATCH = 200
+REPLAY_LOW_WATER = 64 * 1024
+
+class _Client:
+    """Per-connection state: the socket, any bytes not yet written to it and the replay cursor"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.pending = bytearray()
+        # While catching up: last replayed sequence number and the one to replay up to
+        self.replay_seq = None
+        self.replay_until = None
+
+def format_event(seq, record):
+    """Format one catalog change as an SSE message"""
+    return f"id: {seq}\nevent: quake\ndata: {record}\n\n".encode('utf-8')
+
+class EventBroadcaster(threading.Thread):
+    """Push catalog changes to SSE clients from a single selector loop"""
+
+    def __init__(self, db_path, poll_interval=2.0, heartbeat_interval=15.0, retry_ms=5000):
+        super().__init__(name='event-broadcaster', daemon=True)
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_ms = retry_ms
+        self._selector = selectors.DefaultSelector()
+        self._clients = {}
+        self._incoming = []
+        self._lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self._running = True
+        self._conn = None
+        self._last_seq = None
+
+    def add_client(self, sock, last_event_id=None):
+        """Hand over a socket whose SSE response headers have already been sent"""
+        with self._lock:
+            self._incoming.append((sock, last_event_id))
+        self._wake()
+
+    def stop(self):
+        """Stop the loop and close every client connection"""
+        self._running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def run(self):
+        next_poll = next_heartbeat = time.monotonic()
+
+        while self._running:
+            # One failed poll or client must not kill the thread; log it, reconnect and go on
+            try:
+                if self._conn is None:
+                    self._connect()
+                    next_poll = time.monotonic()
+
+                now = time.monotonic()
+                timeout = max(0.0, min(next_poll, next_heartbeat) - now)
+                for key, events in self._selector.select(timeout):
+                    if key.fileobj is self._wakeup_r:
+                        self._drain_wakeup()
+                        continue
+                    client = key.data
+                    if events & selectors.EVENT_READ:
+                        self._read_client(client)
+                    if events & selectors.EVENT_WRITE and client.sock in self._clients:
+                        self._flush(client)
+
+                self._accept_incoming()
+
+                now = time.monotonic()
+                if now >= next_poll:
+                    self._poll_changes()
+                    next_poll = now + self.poll_interval
+                if now >= next_heartbeat:
+                    self._broadcast(b': heartbeat\n\n')
+                    next_heartbeat = now + self.heartbeat_interval
+
+            except Exception as e:
+                print(f"❌ Live update broadcaster error: {e}")
+                self._close_conn()
+                time.sleep(ERROR_BACKOFF)
+
+        for client in list(self._clients.values()):
+            self._drop(client)
+        with self._lock:
+            incoming, self._incoming = self._incoming, []
+        for sock, _ in incoming:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._close_conn()
+
+    def _connect(self):
+        self._conn = earthquake_store.connect(self.db_path)
+        # Start after the newest change; after a reconnect, carry on from where the stream stopped
+        if self._last_seq is None:
+            self._last_seq = earthquake_store.last_seq(self._conn)
+
+    def _close_conn(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _accept_incoming(self):
+        with self._lock:
+            incoming, self._incoming = self._incoming, []
+        for sock, last_event_id in incoming:
+            sock.setblocking(False)
+            client = _Client(sock)
+            self._clients[sock] = client
+            self._selector.register(sock, selectors.EVENT_READ, client)
+            client.pending += f"retry: {self.retry_ms}\n\n".encode('utf-8')
+            # Replay what the client missed while it was disconnected, never the seed;
+            # _flush queues it batch by batch as the socket drains
+            if last_event_id is not None:
+                client.replay_seq = max(last_event_id, earthquake_store.stream_floor(self._conn))
+                client.replay_until = self._last_seq
+            self._flush(client)
+
+    def _fill_replay(self, client):
+        """Queue the next batch of missed events once the client has drained the last one"""
+        while client.replay_seq is not None and len(client.pending) < REPLAY_LOW_WATER:
+            rows = earthquake_store.changes_since(self._conn, client.replay_seq, REPLAY_BATCH)
+            rows = [(s, record) for s, record in rows if s <= client.replay_until]
+            if not rows:
+                # Caught up; from now on the client gets live broadcasts
+                client.replay_seq = client.replay_until = None
+                return
+            for s, record in rows:
+                client.pending += format_event(s, record)
+            client.replay_seq = rows[-1][0]
+
+    def _poll_changes(self):
+        # Rows written by a seed are skipped: the cursor moves past them without publishing
+        self._last_seq = max(self._last_seq, earthquake_store.stream_floor(self._conn))
+        while True:
+            rows = earthquake_store.changes_since(self._conn, self._last_seq)
+            if not rows:
+                return
+            payload = b''.join(format_event(seq, record) for seq, record in rows)
+            self._last_seq = rows[-1][0]
+            self._broadcast(payload)
+
+    def _broadcast(self, payload):
+        for client in list(self._clients.values()):
+            if client.replay_seq is not None:
+                # Still catching up: the replay reaches these events in order
+                client.replay_until = self._last_seq
+                continue
+            client.pending += payload
+            self._flush(client)
+
+    def _read_client(self, client):
+        # Clients never send anything after the request; readable means closed
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(client)
+
+    def _flush(self, client):
+        try:
+            while True:
+                self._fill_replay(client)
+                if not client.pending:
+                    break
+                sent = client.sock.send(client.pending)
+                del client.pending[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(client)
+            return
+
+        if len(client.pending) > MAX_PENDING_BYTES:
+            self._drop(client)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.pending else 0)
+        self._selector.modify(client.sock, events, client)
+
+    def _drop(self, client):
+        if self._clients.pop(client.sock, None) is None:
+            return
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            client.sock.close()
+        except OSError:
+            pass
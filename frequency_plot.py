@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Plot stage for the daily earthquake frequency counts
+Renders headless with the Agg backend, downsamples each series to the plot's
+pixel width with Largest-Triangle-Three-Buckets (LTTB), and skips a plot when
+the hash of its input counts matches the last render. Per-period plots (whole
+catalog, last decade, last year) are rendered in parallel processes.
+"""
+
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+FIGSIZE = (12, 6)
+DPI = 100
+# Bump when the plot layout changes so cached hashes are invalidated
+RENDER_VERSION = 2
+# Plots can be rendered from a threaded process (eqdata worker, server.py), where fork is unsafe
+MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# period -> (days back from the latest date or None for all, output file, title)
+PERIODS = {
+    'all': (None, 'date_frequency_counts.png', 'Daily Frequency Counts of Events'),
+    'last_decade': (3653, 'date_frequency_counts_last_decade.png', 'Daily Frequency Counts of Events (Last Decade)'),
+    'last_year': (366, 'date_frequency_counts_last_year.png', 'Daily Frequency Counts of Events (Last Year)'),
+}
+
+def lttb(x, y, threshold):
+    """Downsample a series to `threshold` points with Largest-Triangle-Three-Buckets"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    xf = x.astype(float)
+    yf = y.astype(float)
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        # Average of the next bucket is the third corner of the triangle
+        avg_x = xf[end:next_end].mean()
+        avg_y = yf[end:next_end].mean()
+        area = np.abs((xf[a] - avg_x) * (yf[start:end] - yf[a]) - (xf[a] - xf[start:end]) * (avg_y - yf[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+
+    return x[indices], y[indices]
+
+def _series_arrays(counts):
+    """Convert a date-indexed pandas Series of counts to (day number, count) arrays"""
+    x = np.asarray(counts.index, dtype='datetime64[D]').astype(np.int64)
+    y = np.asarray(counts.values, dtype=np.int64)
+    return x, y
+
+def _fill_days(x, y, first, last):
+    """Spread counts over every day from `first` to `last`, with 0 on days without events"""
+    days = np.arange(first, last + 1, dtype=np.int64)
+    filled = np.zeros(len(days), dtype=np.int64)
+    filled[x - first] = y
+    return days, filled
+
+def _digest(title, series):
+    h = hashlib.sha256(f"{RENDER_VERSION}|{FIGSIZE}|{DPI}|{title}".encode('utf-8'))
+    for label, color, x, y in series:
+        h.update(f"|{label}|{color}|".encode('utf-8'))
+        h.update(x.tobytes())
+        h.update(y.tobytes())
+    return h.hexdigest()
+
+def _hash_path(output_path):
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f'.{name}.sha256')
+
+def _is_current(output_path, digest):
+    try:
+        with open(_hash_path(output_path), 'r', encoding='utf-8') as f:
+            return f.read().strip() == digest and os.path.exists(output_path)
+    except OSError:
+        return False
+
+def _render(job):
+    """Render one plot; runs in a worker process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    output_path, title, series, digest = job
+
+    fig, ax = plt.subplots(figsize=FIGSIZE, dpi=DPI)
+    # One point per pixel column of the plotting area, not of the whole figure
+    width_px = int(ax.get_window_extent().width)
+    for label, color, x, y in series:
+        x, y = lttb(x, y, width_px)
+        ax.plot(x.astype('datetime64[D]'), y, label=label, color=color, linewidth=0.8)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Frequency Count')
+    ax.set_title(title)
+    ax.legend()
+    ax.grid()
+    fig.savefig(output_path)
+    plt.close(fig)
+
+    with open(_hash_path(output_path), 'w', encoding='utf-8') as f:
+        f.write(digest)
+    return output_path
+
+def plot_frequency_counts(output_dir, series, periods=('all', 'last_decade', 'last_year')):
+    """
+    Render the frequency plots for the given periods.
+    `series` is a list of (label, color, counts) with counts a date-indexed pandas Series.
+    Returns the paths that were (re)rendered; unchanged plots are skipped.
+    """
+    arrays = [(label, color) + _series_arrays(counts) for label, color, counts in series]
+    latest = max((int(x.max()) for _, _, x, _ in arrays if len(x)), default=0)
+    earliest = min((int(x.min()) for _, _, x, _ in arrays if len(x)), default=0)
+    # value_counts() leaves out days without events; fill them in so the plot (and LTTB)
+    # does not draw a straight line across empty stretches
+    arrays = [(label, color) + (_fill_days(x, y, earliest, latest) if len(x) else (x, y))
+              for label, color, x, y in arrays]
+
+    jobs = []
+    for period in periods:
+        days, filename, title = PERIODS[period]
+        output_path = os.path.join(output_dir, filename)
+        period_series = []
+        for label, color, x, y in arrays:
+            if days is not None:
+                keep = x > latest - days
+                x, y = x[keep], y[keep]
+            period_series.append((label, color, x, y))
+
+        digest = _digest(title, period_series)
+        if _is_current(output_path, digest):
+            print(f"⏭️  {filename} is up to date, skipping render")
+            continue
+        jobs.append((output_path, title, period_series, digest))
+
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1), mp_context=MP_CONTEXT) as executor:
+            rendered = list(executor.map(_render, jobs))
+    else:
+        rendered = [_render(job) for job in jobs]
+
+    for output_path in rendered:
+        print(f"🖼️  Rendered {os.path.basename(output_path)}")
+    return rendered
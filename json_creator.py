@@ -2,14 +2,19 @@
 import os
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-#import the csv file
-data_file_path = os.path.join(script_dir, 'data.csv')
-import pandas as pd
-data = pd.read_csv(data_file_path)
-data['time'] = pd.to_datetime(data['time'])
-data = data.sort_values(by='time', ascending=False)
-data = data.reset_index(drop=True)
+def main():
+    """Convert data.csv to data.json, newest first"""
+    #import the csv file
+    data_file_path = os.path.join(script_dir, 'data.csv')
+    import pandas as pd
+    data = pd.read_csv(data_file_path)
+    data['time'] = pd.to_datetime(data['time'])
+    data = data.sort_values(by='time', ascending=False)
+    data = data.reset_index(drop=True)
 
-#save file as json in the same directory as the script
-output_file_path = os.path.join(script_dir, 'data.json')
-data.to_json(output_file_path, orient='records', lines=True)
\ No newline at end of file
+    #save file as json in the same directory as the script
+    output_file_path = os.path.join(script_dir, 'data.json')
+    data.to_json(output_file_path, orient='records', lines=True)
+
+if __name__ == '__main__':
+    main()
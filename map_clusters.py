@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Hierarchical spatial clustering of the earthquake catalog for the map
+Events are bucketed into a Web Mercator pixel grid at the deepest zoom level,
+and each coarser level is built by merging the four child cells below it.
+Cells are also split by magnitude (0.1 steps) so the map's minimum magnitude
+filter can be answered on the server. Updates only touch the cells of the
+events that changed, and a map query only visits cells inside the viewport.
+"""
+
+import json
+import math
+import os
+import threading
+
+import earthquake_store
+
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+TILE_SIZE = 256
+CELL_PX = 64
+MAX_LAT = 85.05112878
+
+def _world_pixel(lat, lon, zoom):
+    """Project lat/lon to Web Mercator pixel coordinates at a zoom level"""
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    scale = TILE_SIZE * (1 << zoom)
+    x = (lon + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+def _cell(lat, lon, zoom):
+    """Return the grid cell containing a point at a zoom level"""
+    x, y = _world_pixel(lat, lon, zoom)
+    return int(x // CELL_PX), int(y // CELL_PX)
+
+def _mag_bin(mag):
+    """Bucket a magnitude into 0.1 steps, matching the map's filter slider"""
+    return int(math.floor(mag * 10 + 1e-9))
+
+def _summary(eq_id, earthquake):
+    """The fields the map needs to draw and describe a single event"""
+    return {
+        'id': eq_id,
+        'time': earthquake.get('time'),
+        'place': earthquake.get('place'),
+        'depth': earthquake.get('depth'),
+    }
+
+class ClusterIndex:
+    """Per-zoom cluster statistics: count, max magnitude and centroid"""
+
+    def __init__(self, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        # id -> (lat, lon, mag, summary)
+        self.events = {}
+        # Leaf level membership: (cx, cy, bin) -> set of ids
+        self.members = {}
+        # zoom -> {(cx, cy): {bin: [count, max_mag, sum_lat, sum_lon, summary]}}
+        self.levels = {z: {} for z in range(min_zoom, max_zoom + 1)}
+
+    def __len__(self):
+        return len(self.events)
+
+    def update(self, earthquakes):
+        """Add new or revised earthquakes and refresh only the affected cells"""
+        dirty = set()
+        for earthquake in earthquakes:
+            # Same ID as the catalog, so records without an 'id' do not collapse into one
+            eq_id = earthquake_store.earthquake_id(earthquake)
+            try:
+                lat = float(earthquake['latitude'])
+                lon = float(earthquake['longitude'])
+                mag = float(earthquake['mag'])
+                valid = math.isfinite(lat) and math.isfinite(lon) and math.isfinite(mag)
+            except (KeyError, TypeError, ValueError):
+                valid = False
+            if not valid:
+                if eq_id in self.events:
+                    dirty.add(self._remove(eq_id))
+                continue
+
+            entry = (lat, lon, mag, _summary(eq_id, earthquake))
+            old = self.events.get(eq_id)
+            if old == entry:
+                continue
+            if old is not None:
+                dirty.add(self._remove(eq_id))
+
+            key = _cell(lat, lon, self.max_zoom) + (_mag_bin(mag),)
+            self.events[eq_id] = entry
+            self.members.setdefault(key, set()).add(eq_id)
+            dirty.add(key)
+
+        if dirty:
+            self._rebuild(dirty)
+        return len(dirty)
+
+    def remove(self, eq_ids):
+        """Drop earthquakes that left the catalog and refresh only the affected cells"""
+        dirty = {self._remove(eq_id) for eq_id in eq_ids if eq_id in self.events}
+        if dirty:
+            self._rebuild(dirty)
+        return len(dirty)
+
+    def _remove(self, eq_id):
+        lat, lon, mag, _ = self.events.pop(eq_id)
+        key = _cell(lat, lon, self.max_zoom) + (_mag_bin(mag),)
+        members = self.members.get(key)
+        if members is not None:
+            members.discard(eq_id)
+            if not members:
+                del self.members[key]
+        return key
+
+    def _rebuild(self, dirty):
+        # Leaf cells are recomputed from their member events
+        leaf = self.levels[self.max_zoom]
+        for cx, cy, b in dirty:
+            stats = None
+            for eq_id in self.members.get((cx, cy, b), ()):
+                lat, lon, mag, summary = self.events[eq_id]
+                if stats is None:
+                    stats = [1, mag, lat, lon, summary]
+                else:
+                    stats[0] += 1
+                    stats[1] = max(stats[1], mag)
+                    stats[2] += lat
+                    stats[3] += lon
+                    stats[4] = None
+            self._store(leaf, (cx, cy), b, stats)
+
+        # Coarser levels are merged from their four children
+        for zoom in range(self.max_zoom - 1, self.min_zoom - 1, -1):
+            dirty = {(cx >> 1, cy >> 1, b) for cx, cy, b in dirty}
+            level = self.levels[zoom]
+            children = self.levels[zoom + 1]
+            for cx, cy, b in dirty:
+                stats = None
+                for dx in (0, 1):
+                    for dy in (0, 1):
+                        child = children.get((2 * cx + dx, 2 * cy + dy), {}).get(b)
+                        if child is None:
+                            continue
+                        if stats is None:
+                            stats = list(child)
+                        else:
+                            stats[0] += child[0]
+                            stats[1] = max(stats[1], child[1])
+                            stats[2] += child[2]
+                            stats[3] += child[3]
+                            stats[4] = None
+                self._store(level, (cx, cy), b, stats)
+
+    @staticmethod
+    def _store(level, cell, b, stats):
+        if stats is None:
+            bins = level.get(cell)
+            if bins is not None:
+                bins.pop(b, None)
+                if not bins:
+                    del level[cell]
+        else:
+            level.setdefault(cell, {})[b] = stats
+
+    def query(self, zoom, west, south, east, north, min_mag=None):
+        """Return the clusters visible in a bounding box at a zoom level"""
+        zoom = max(self.min_zoom, min(self.max_zoom, int(zoom)))
+        level = self.levels[zoom]
+        min_bin = _mag_bin(min_mag) if min_mag is not None else None
+
+        x0, y0 = _cell(north, west, zoom)
+        x1, y1 = _cell(south, east, zoom)
+        cells_across = 1 << zoom
+        x0 = max(0, x0)
+        y0 = max(0, y0)
+        x1 = min(cells_across * TILE_SIZE // CELL_PX - 1, x1)
+        y1 = min(cells_across * TILE_SIZE // CELL_PX - 1, y1)
+
+        # Visit whichever is smaller: the viewport's cells or the occupied ones
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(level):
+            cells = ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        else:
+            cells = (c for c in level if x0 <= c[0] <= x1 and y0 <= c[1] <= y1)
+
+        clusters = []
+        for cell in cells:
+            bins = level.get(cell)
+            if not bins:
+                continue
+            count = 0
+            max_mag = None
+            sum_lat = sum_lon = 0.0
+            summary = None
+            for b, stats in bins.items():
+                if min_bin is not None and b < min_bin:
+                    continue
+                count += stats[0]
+                max_mag = stats[1] if max_mag is None else max(max_mag, stats[1])
+                sum_lat += stats[2]
+                sum_lon += stats[3]
+                summary = stats[4]
+            if not count:
+                continue
+            cluster = {
+                'lat': round(sum_lat / count, 4),
+                'lon': round(sum_lon / count, 4),
+                'count': count,
+                'maxMag': max_mag,
+            }
+            if count == 1 and summary:
+                cluster.update(summary)
+            clusters.append(cluster)
+        return clusters
+
+class CatalogClusters:
+    """Keep a ClusterIndex in step with the catalog on disk"""
+
+    def __init__(self, json_file_path, db_path=None):
+        self.json_file_path = json_file_path
+        self.db_path = db_path
+        self.index = ClusterIndex()
+        self._conn = None
+        self._last_seq = 0
+        self._json_mtime = None
+        # hash of each raw line in data.json -> its event ID, to spot added, revised and removed events
+        self._json_lines = {}
+        # The server handles requests on several threads: one refresh runs at a time,
+        # and the index itself is only locked while it is updated or queried
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def refresh(self, wait=True):
+        """
+        Feed earthquakes ingested since the last refresh into the index.
+        With wait=False, return at once if another thread is already refreshing.
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return 0
+        try:
+            if self.db_path:
+                return self._refresh_from_store()
+            return self._refresh_from_json()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_from_store(self):
+        if self._conn is None:
+            self._conn = earthquake_store.connect(self.db_path)
+        changed = 0
+        while True:
+            rows = earthquake_store.changes_since(self._conn, self._last_seq, limit=5000)
+            if not rows:
+                return changed
+            earthquakes = [json.loads(record) for _, record in rows]
+            with self._lock:
+                changed += self.index.update(earthquakes)
+            self._last_seq = rows[-1][0]
+
+    def _refresh_from_json(self):
+        try:
+            mtime = os.path.getmtime(self.json_file_path)
+        except OSError:
+            return 0
+        if mtime == self._json_mtime:
+            return 0
+
+        # Hash the raw lines and decode only the ones not seen before (new or revised);
+        # IDs that no longer appear on any line are dropped
+        with open(self.json_file_path, 'rb') as f:
+            data = f.read()
+        lines = {}
+        earthquakes = []
+        for line in data.split(b'\n'):
+            line = line.strip()
+            if not line:
+                continue
+            digest = hash(line)
+            if digest in lines:
+                continue
+            eq_id = self._json_lines.get(digest)
+            if eq_id is None:
+                try:
+                    earthquake = json.loads(line)
+                except ValueError:
+                    continue
+                eq_id = earthquake_store.earthquake_id(earthquake)
+                earthquakes.append(earthquake)
+            lines[digest] = eq_id
+
+        removed = set(self._json_lines.values()).difference(lines.values())
+        with self._lock:
+            changed = self.index.remove(removed)
+            changed += self.index.update(earthquakes)
+        self._json_lines = lines
+        self._json_mtime = mtime
+        return changed
+
+    def query(self, zoom, west, south, east, north, min_mag=None):
+        """Refresh from the catalog, then return the clusters in view"""
+        # A request never waits for another thread's refresh; it answers from the current index
+        self.refresh(wait=False)
+        with self._lock:
+            return self.index.query(zoom, west, south, east, north, min_mag)
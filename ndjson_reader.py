@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Parallel reader for the JSON-lines earthquake catalog
+The file is split into newline-aligned byte ranges that are decoded in a
+process pool. Workers apply the field projection and the magnitude/time
+predicates before sending anything back, and return compact per-shard
+results: typed column arrays, a line index, or partial aggregates, which are
+merged in file order. Full records never cross the process boundary; callers
+that need to rewrite the file copy raw lines through the line index instead.
+Small files are read in-process, where a pool would cost more than it saves.
+"""
+
+import json
+import mmap
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from earthquake_store import earthquake_id
+
+# Below this size the whole file is decoded in the calling process
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# Pools are also started from server.py's request threads, and forking a
+# multi-threaded process can deadlock, so workers come from a fork server instead
+MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+def shard_ranges(path, shards):
+    """Split a file into at most `shards` byte ranges that start and end on line boundaries"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    shards = max(1, min(shards, size))
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, shards):
+            f.seek(max(size * i // shards, bounds[-1]))
+            # Move to the start of the next line so no record is split
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _matches(record, min_mag, since, until):
+    if min_mag is not None:
+        mag = record.get('mag')
+        if mag is None or mag < min_mag:
+            return False
+    if since is not None or until is not None:
+        t = record.get('time')
+        if t is None:
+            return False
+        if since is not None and t < since:
+            return False
+        if until is not None and t > until:
+            return False
+    return True
+
+class LineIndex:
+    """Byte offset, length, time and catalog ID of each record line in a file"""
+
+    def __init__(self):
+        self.offsets = array('q')
+        self.lengths = array('q')
+        # Missing times are stored as 0, matching the x.get('time', 0) sort key
+        self.times = array('d')
+        self.ids = []
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, offset, length, time, eq_id):
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.times.append(time)
+        self.ids.append(eq_id)
+
+    def extend(self, other):
+        self.offsets.extend(other.offsets)
+        self.lengths.extend(other.lengths)
+        self.times.extend(other.times)
+        self.ids.extend(other.ids)
+
+def _iter_shard(path, start, end, fields, min_mag, since, until, skip_invalid, errors):
+    """Decode the lines of one byte range, applying predicates and projection.
+    Yields (byte offset, line length, record)."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+
+    offset = start
+    for line in chunk.split(b'\n'):
+        line_offset = offset
+        offset += len(line) + 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            if not skip_invalid:
+                raise ValueError(f"Invalid JSON at byte {line_offset} of {path}: {e}") from e
+            errors.append((line_offset, str(e)))
+            continue
+        if not _matches(record, min_mag, since, until):
+            continue
+        if fields is not None:
+            record = {name: record.get(name) for name in fields}
+        yield line_offset, len(line), record
+
+def _index_task(task):
+    path, start, end, _, min_mag, since, until, skip_invalid = task
+    errors = []
+    index = LineIndex()
+    for offset, length, record in _iter_shard(path, start, end, None, min_mag, since, until, skip_invalid, errors):
+        index.append(offset, length, record.get('time') or 0, earthquake_id(record))
+    return index, errors
+
+def _columns_task(task):
+    path, start, end, columns, min_mag, since, until, skip_invalid = task
+    errors = []
+    result = {name: array(typecode) for name, typecode in columns.items()}
+    # Missing values become NaN in float columns and 0 in integer columns
+    missing = {name: (float('nan') if typecode in 'fd' else 0) for name, typecode in columns.items()}
+    for _, _, record in _iter_shard(path, start, end, list(columns), min_mag, since, until, skip_invalid, errors):
+        for name, values in result.items():
+            value = record[name]
+            values.append(missing[name] if value is None else value)
+    return result, errors
+
+def _aggregate_task(task):
+    path, start, end, (fields, shard_fn), min_mag, since, until, skip_invalid = task
+    errors = []
+    records = (record for _, _, record in _iter_shard(path, start, end, fields, min_mag, since, until, skip_invalid, errors))
+    partial = shard_fn(records)
+    return partial, errors
+
+def _run(path, worker, extra, min_mag, since, until, skip_invalid, workers):
+    """Run `worker` over every shard and return (results in file order, skipped lines)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if os.path.getsize(path) < PARALLEL_MIN_BYTES:
+        workers = 1
+
+    tasks = [(path, start, end, extra, min_mag, since, until, skip_invalid)
+             for start, end in shard_ranges(path, workers)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=MP_CONTEXT) as executor:
+            outputs = list(executor.map(worker, tasks))
+    else:
+        outputs = [worker(task) for task in tasks]
+
+    results = [result for result, _ in outputs]
+    errors = [error for _, shard_errors in outputs for error in shard_errors]
+    return results, errors
+
+def read_line_index(path, min_mag=None, since=None, until=None,
+                    skip_invalid=False, workers=None):
+    """
+    Index the matching record lines of a file, in file order.
+    `min_mag`, `since` and `until` (epoch milliseconds) filter records inside the workers.
+    Returns (LineIndex, errors) where errors lists (byte offset, message) of skipped lines.
+    """
+    shards, errors = _run(path, _index_task, None, min_mag, since, until, skip_invalid, workers)
+    index = LineIndex()
+    for shard in shards:
+        index.extend(shard)
+    return index, errors
+
+def write_lines(out, path, index, order, new_records=()):
+    """
+    Write record lines to the binary file `out` in the given order.
+    Positions below len(index) copy the raw line from `path`; higher positions
+    write new_records[position - len(index)] as compact JSON.
+    Returns the LineIndex of the written file.
+    """
+    written = LineIndex()
+    offset = 0
+    existing = len(index)
+    with open(path, 'rb') if existing else open(os.devnull, 'rb') as src:
+        mm = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) if existing else None
+        try:
+            for position in order:
+                if position < existing:
+                    start = index.offsets[position]
+                    line = mm[start:start + index.lengths[position]]
+                    time, eq_id = index.times[position], index.ids[position]
+                else:
+                    record = new_records[position - existing]
+                    line = json.dumps(record, separators=(',', ':')).encode('utf-8')
+                    time, eq_id = record.get('time') or 0, earthquake_id(record)
+                out.write(line)
+                out.write(b'\n')
+                written.append(offset, len(line), time, eq_id)
+                offset += len(line) + 1
+        finally:
+            if mm is not None:
+                mm.close()
+    return written
+
+def read_columns(path, columns, min_mag=None, since=None, until=None,
+                 skip_invalid=False, workers=None):
+    """
+    Read matching records as typed column arrays, in file order.
+    `columns` maps field names to array typecodes, e.g. {'time': 'q', 'mag': 'd'}.
+    Returns (columns, errors) with one array.array per requested field.
+    """
+    shards, errors = _run(path, _columns_task, columns, min_mag, since, until, skip_invalid, workers)
+    merged = {name: array(typecode) for name, typecode in columns.items()}
+    for shard in shards:
+        for name, values in shard.items():
+            merged[name].extend(values)
+    return merged, errors
+
+def aggregate(path, shard_fn, fields=None, min_mag=None, since=None, until=None,
+              skip_invalid=False, workers=None):
+    """
+    Reduce each shard with `shard_fn(records)` and return the partial results in file order.
+    `shard_fn` must be a module-level function so it can be sent to worker processes;
+    the caller merges the partials.
+    """
+    return _run(path, _aggregate_task, (fields, shard_fn), min_mag, since, until, skip_invalid, workers)
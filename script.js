@@ -2,6 +2,10 @@
 let earthquakeData = [];
 let map;
 let magnitudeChart, timelineChart, depthMagnitudeChart, monthlyChart;
+let liveSource = null;
+let liveRefreshTimer = null;
+let serverClusters = location.protocol !== 'file:'; // Cleared when there is no /clusters endpoint (static hosting)
+let clusterRequest = 0;
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -9,13 +13,72 @@ document.addEventListener('DOMContentLoaded', function() {
     loadEarthquakeData();
     setupEventListeners();
     checkGitHubUpdate();
+    startLiveUpdates();
 });
 
+// Normalize a raw earthquake record for display
+function normalizeEarthquake(earthquake) {
+    // Convert timestamp to readable datetime if needed
+    if (earthquake.time && !earthquake.datetime) {
+        earthquake.datetime = new Date(earthquake.time).toISOString();
+    }
+    // Ensure magnitude is properly named
+    if (earthquake.mag && !earthquake.magnitude) {
+        earthquake.magnitude = earthquake.mag;
+    }
+    return earthquake;
+}
+
+// Subscribe to pushed updates from server.py (not available on GitHub Pages)
+function startLiveUpdates() {
+    if (!window.EventSource) return;
+    
+    liveSource = new EventSource('events');
+    
+    liveSource.addEventListener('quake', event => {
+        try {
+            const earthquake = normalizeEarthquake(JSON.parse(event.data));
+            // Replace a revised event in place, otherwise add the new one
+            const index = earthquakeData.findIndex(eq => eq.id === earthquake.id);
+            if (index >= 0) {
+                earthquakeData[index] = earthquake;
+            } else {
+                earthquakeData.unshift(earthquake);
+            }
+            scheduleLiveRefresh();
+        } catch (parseError) {
+            console.warn('Error parsing live update:', event.data, parseError);
+        }
+    });
+    
+    liveSource.addEventListener('error', () => {
+        // The browser reconnects on its own unless the endpoint is missing
+        if (liveSource.readyState === EventSource.CLOSED) {
+            console.log('Live updates unavailable, using periodic refresh');
+            liveSource = null;
+        }
+    });
+}
+
+// Batch live updates so a burst of events re-renders the page once
+function scheduleLiveRefresh() {
+    if (liveRefreshTimer) return;
+    liveRefreshTimer = setTimeout(() => {
+        liveRefreshTimer = null;
+        updateOverviewStats();
+        updateMapMarkers();
+        updateCharts();
+        updateDataTable();
+        document.getElementById('last-github-update').innerHTML = 
+            `Live update: ${new Date().toLocaleString()}`;
+    }, 1000);
+}
+
 // Check GitHub Actions update status
 function checkGitHubUpdate() {
     try {
-        // Try to load data.json with timestamp to check freshness
-        fetch('data.json?' + new Date().getTime())
+        // Only the Last-Modified header is needed, so skip downloading the catalog
+        fetch('data.json?' + new Date().getTime(), { method: 'HEAD' })
             .then(response => {
                 if (response.ok) {
                     const lastModified = response.headers.get('Last-Modified');
@@ -57,16 +120,7 @@ function loadEarthquakeData() {
             for (const line of lines) {
                 if (line.trim()) {
                     try {
-                        const earthquake = JSON.parse(line);
-                        // Convert timestamp to readable datetime if needed
-                        if (earthquake.time && !earthquake.datetime) {
-                            earthquake.datetime = new Date(earthquake.time).toISOString();
-                        }
-                        // Ensure magnitude is properly named
-                        if (earthquake.mag && !earthquake.magnitude) {
-                            earthquake.magnitude = earthquake.mag;
-                        }
-                        data.push(earthquake);
+                        data.push(normalizeEarthquake(JSON.parse(line)));
                     } catch (parseError) {
                         console.warn('Error parsing line:', line, parseError);
                     }
@@ -132,6 +186,11 @@ function initializeMap() {
         weight: 2,
         fillOpacity: 0.1
     }).addTo(map).bindPopup('Iran Region Focus Area');
+    
+    // Clusters depend on the viewport, so refetch them when it changes
+    map.on('moveend', () => {
+        if (serverClusters) updateMapMarkers();
+    });
 }
 
 // Update overview statistics
@@ -155,19 +214,46 @@ function updateOverviewStats() {
         `${minDate.getFullYear()} - ${maxDate.getFullYear()}`;
 }
 
-// Update map markers
-function updateMapMarkers() {
-    if (!map) return;
-    
-    // Clear existing markers
+// Remove all earthquake markers from the map
+function clearMapMarkers() {
     map.eachLayer(layer => {
         if (layer instanceof L.CircleMarker) {
             map.removeLayer(layer);
         }
     });
+}
+
+// Marker color and size based on magnitude
+function magnitudeStyle(magnitude) {
+    if (magnitude < 4) {
+        return { color: '#4CAF50', size: 5 };
+    } else if (magnitude < 6) {
+        return { color: '#FF9800', size: 8 };
+    } else if (magnitude < 7) {
+        return { color: '#FF5722', size: 12 };
+    }
+    return { color: '#F44336', size: 16 };
+}
+
+// Update map markers
+function updateMapMarkers() {
+    if (!map) return;
     
     const minMagnitude = parseFloat(document.getElementById('magnitude-filter').value);
     
+    if (serverClusters) {
+        updateClusterMarkers(minMagnitude);
+        return;
+    }
+    
+    drawEventMarkers(minMagnitude);
+}
+
+// Draw one marker per event in the browser
+function drawEventMarkers(minMagnitude) {
+    // Clear existing markers
+    clearMapMarkers();
+    
     earthquakeData.forEach(earthquake => {
         const magnitude = parseFloat(earthquake.magnitude);
         if (isNaN(magnitude) || magnitude < minMagnitude) return;
@@ -176,17 +262,7 @@ function updateMapMarkers() {
         const lon = parseFloat(earthquake.longitude);
         if (isNaN(lat) || isNaN(lon)) return;
         
-        // Color based on magnitude
-        let color, size;
-        if (magnitude < 4) {
-            color = '#4CAF50'; size = 5;
-        } else if (magnitude < 6) {
-            color = '#FF9800'; size = 8;
-        } else if (magnitude < 7) {
-            color = '#FF5722'; size = 12;
-        } else {
-            color = '#F44336'; size = 16;
-        }
+        const { color, size } = magnitudeStyle(magnitude);
         
         const marker = L.circleMarker([lat, lon], {
             radius: size,
@@ -211,6 +287,82 @@ function updateMapMarkers() {
     });
 }
 
+// Draw the clusters server.py precomputed for the current zoom and viewport
+function updateClusterMarkers(minMagnitude) {
+    const bounds = map.getBounds();
+    const bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+        .map(v => v.toFixed(4)).join(',');
+    const request = ++clusterRequest;
+    
+    fetch(`clusters?zoom=${map.getZoom()}&bbox=${bbox}&minmag=${minMagnitude}`)
+        .then(response => {
+            if (!response.ok) {
+                const error = new Error(`HTTP error! status: ${response.status}`);
+                error.status = response.status;
+                throw error;
+            }
+            return response.json();
+        })
+        .then(result => {
+            // Ignore responses for viewports the user has already left
+            if (request !== clusterRequest) return;
+            
+            clearMapMarkers();
+            result.clusters.forEach(cluster => {
+                const { color, size } = magnitudeStyle(cluster.maxMag);
+                
+                if (cluster.count === 1) {
+                    L.circleMarker([cluster.lat, cluster.lon], {
+                        radius: size,
+                        fillColor: color,
+                        color: '#fff',
+                        weight: 1,
+                        opacity: 1,
+                        fillOpacity: 0.7
+                    }).bindPopup(`
+                        <div class="popup-content">
+                            <h4>Magnitude ${cluster.maxMag}</h4>
+                            <p><strong>Location:</strong> ${cluster.place || 'Unknown'}</p>
+                            <p><strong>Date:</strong> ${new Date(cluster.time).toLocaleDateString()}</p>
+                            <p><strong>Depth:</strong> ${cluster.depth || 'Unknown'} km</p>
+                            <p><strong>Coordinates:</strong> ${cluster.lat.toFixed(3)}, ${cluster.lon.toFixed(3)}</p>
+                        </div>
+                    `).addTo(map);
+                    return;
+                }
+                
+                L.circleMarker([cluster.lat, cluster.lon], {
+                    radius: Math.min(30, size + 4 * Math.log10(cluster.count)),
+                    fillColor: color,
+                    color: '#fff',
+                    weight: 2,
+                    opacity: 1,
+                    fillOpacity: 0.6
+                }).bindTooltip(`${cluster.count}`, {
+                    permanent: true,
+                    direction: 'center',
+                    className: 'cluster-label'
+                }).on('click', () => {
+                    // Zoom in to split the cluster
+                    map.setView([cluster.lat, cluster.lon], map.getZoom() + 2);
+                }).addTo(map);
+            });
+        })
+        .catch(error => {
+            if (request !== clusterRequest) return;
+            
+            if (error.status === 404) {
+                // Static hosting (GitHub Pages) has no cluster endpoint
+                console.log('Server clusters unavailable, drawing markers in the browser');
+                serverClusters = false;
+            } else {
+                // Transient failure: draw in the browser for now and retry on the next map move
+                console.log('Error loading server clusters, will retry:', error);
+            }
+            drawEventMarkers(minMagnitude);
+        });
+}
+
 // Update all charts
 function updateCharts() {
     updateMagnitudeChart();
@@ -494,6 +646,8 @@ function updateDataTable() {
 
 // Auto-refresh data every 6 hours (matching GitHub Actions schedule)
 setInterval(() => {
+    // Live updates already keep the data current
+    if (liveSource) return;
     console.log('Auto-refreshing earthquake data...');
     loadEarthquakeData();
     checkGitHubUpdate();
@@ -6,47 +6,95 @@ Simple HTTP server for the Historical Earthquakes website
 import http.server
 import socketserver
 import os
+import json
+import math
 import webbrowser
-import subprocess
-import sys
-from threading import Timer
+from threading import Timer, Lock
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+from map_clusters import CatalogClusters
+
+# Live event stream is served from the SQLite catalog when EARTHQUAKE_DB is set
+EVENT_DB_PATH = os.environ.get('EARTHQUAKE_DB')
+
+# Long-lived update worker, so the catalog and HTTP session stay warm between updates
+_update_worker = None
+# Requests are handled on threads; only one update may run at a time
+_update_lock = Lock()
 
 def update_earthquake_data():
     """Update earthquake data with latest weekly data from USGS"""
-    try:
-        print(f"🔄 Updating earthquake data... ({datetime.now().strftime('%H:%M:%S')})")
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        update_script = os.path.join(script_dir, 'update_earthquake_data.py')
-        
-        # Use the same Python executable that's running this script
-        result = subprocess.run([sys.executable, update_script], 
-                              capture_output=True, text=True, cwd=script_dir)
-        
-        if result.returncode == 0:
-            print("✅ Earthquake data updated successfully")
-        else:
-            print("⚠️  Data update completed with warnings")
-            
-        # Print any output for debugging
-        if result.stdout:
-            print("Update output:", result.stdout.strip())
-        if result.stderr:
-            print("Update errors:", result.stderr.strip())
+    global _update_worker
+    with _update_lock:
+        try:
+            print(f"🔄 Updating earthquake data... ({datetime.now().strftime('%H:%M:%S')})")
+            if _update_worker is None:
+                from eqdata import UpdateWorker
+                _update_worker = UpdateWorker(db_path=EVENT_DB_PATH)
             
-    except Exception as e:
-        print(f"❌ Error updating earthquake data: {e}")
+            if _update_worker.update():
+                print("✅ Earthquake data updated successfully")
+            else:
+                print("⚠️  Data update completed with warnings")
+                
+        except Exception as e:
+            print(f"❌ Error updating earthquake data: {e}")
+
+class EarthquakeServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Threaded TCP server that can hand long-lived connections over to the event broadcaster.
+    Each request runs on its own short-lived thread, so a slow data update never stalls
+    the accept loop; SSE connections are detached and leave their thread right away.
+    """
+    
+    allow_reuse_address = True
+    daemon_threads = True
+    # Absorb reconnect storms from many dashboards after a restart
+    request_queue_size = 1024
+    
+    def __init__(self, *args, broadcaster=None, clusters=None, **kwargs):
+        self.broadcaster = broadcaster
+        self.clusters = clusters
+        self._detached = set()
+        self._detached_lock = Lock()
+        super().__init__(*args, **kwargs)
+    
+    def detach(self, request):
+        """Keep the socket open after the handler returns"""
+        with self._detached_lock:
+            self._detached.add(request)
+    
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
 
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """Custom handler that updates data on first request"""
     
     _data_updated = False
+    _data_updated_lock = Lock()
     
     def do_GET(self):
+        if self.path.split('?')[0] == '/events':
+            self.handle_events()
+            return
+        if self.path.split('?')[0] == '/clusters':
+            self.handle_clusters()
+            return
+        
         # Update data on first request or when explicitly requested
-        if not CustomHTTPRequestHandler._data_updated or self.path == '/update-data':
+        run_update = self.path == '/update-data'
+        with CustomHTTPRequestHandler._data_updated_lock:
+            if not CustomHTTPRequestHandler._data_updated:
+                CustomHTTPRequestHandler._data_updated = True
+                run_update = True
+        
+        if run_update:
             update_earthquake_data()
-            CustomHTTPRequestHandler._data_updated = True
             
             # If it was an update request, redirect to home
             if self.path == '/update-data':
@@ -57,6 +105,58 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         # Handle normal requests
         super().do_GET()
+    
+    def handle_clusters(self):
+        """Return the map clusters visible at a zoom level and bounding box"""
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            zoom = int(query['zoom'][0])
+            west, south, east, north = (float(v) for v in query['bbox'][0].split(','))
+            min_mag = float(query['minmag'][0]) if 'minmag' in query else None
+            # float() accepts 'nan' and 'inf', which the grid cannot place
+            if not all(math.isfinite(v) for v in (west, south, east, north, min_mag or 0.0)):
+                raise ValueError('non-finite value')
+        except (KeyError, ValueError):
+            self.send_error(400, 'Expected zoom=<int>&bbox=<west,south,east,north>[&minmag=<float>]')
+            return
+        
+        clusters = self.server.clusters.query(zoom, west, south, east, north, min_mag)
+        body = json.dumps({'zoom': zoom, 'clusters': clusters}, separators=(',', ':')).encode('utf-8')
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_events(self):
+        """Open a Server-Sent Events stream of new and revised earthquakes"""
+        broadcaster = self.server.broadcaster
+        if broadcaster is None:
+            self.send_error(503, 'Live updates need the SQLite catalog (set EARTHQUAKE_DB)')
+            return
+        if not broadcaster.is_alive():
+            self.send_error(503, 'Live update broadcaster is not running')
+            return
+        
+        try:
+            last_event_id = int(self.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            last_event_id = None
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.flush()
+        
+        # The broadcaster owns the socket from here on
+        self.close_connection = True
+        self.server.detach(self.request)
+        broadcaster.add_client(self.request, last_event_id)
 
 def open_browser():
     """Open the website in the default browser after a short delay"""
@@ -68,13 +168,27 @@ if __name__ == "__main__":
     
     PORT = 8000
     
+    # Start the live event stream if the SQLite catalog is enabled
+    broadcaster = None
+    if EVENT_DB_PATH:
+        from event_stream import EventBroadcaster
+        broadcaster = EventBroadcaster(EVENT_DB_PATH)
+        broadcaster.start()
+    
+    # Map clusters are built once and then refreshed with each ingest
+    clusters = CatalogClusters(os.path.join(os.getcwd(), 'data.json'), EVENT_DB_PATH)
+    clusters.refresh()
+    print(f"🗺️  Indexed {len(clusters.index)} earthquakes for map clusters")
+    
     # Create a simple HTTP server with custom handler
     Handler = CustomHTTPRequestHandler
     
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    with EarthquakeServer(("", PORT), Handler, broadcaster=broadcaster, clusters=clusters) as httpd:
         print(f"🌍 Historical Earthquakes Website Server")
         print(f"📡 Server running at: http://localhost:{PORT}")
         print(f"📂 Serving files from: {os.getcwd()}")
+        if broadcaster:
+            print(f"⚡ Live updates at: http://localhost:{PORT}/events")
         print(f"🚀 Opening browser automatically...")
         print(f"⏹️  Press Ctrl+C to stop the server")
         
@@ -85,4 +199,6 @@ if __name__ == "__main__":
             httpd.serve_forever()
         except KeyboardInterrupt:
             print(f"\n🛑 Server stopped by user")
+            if broadcaster:
+                broadcaster.stop()
             httpd.shutdown()
\ No newline at end of file
@@ -4,10 +4,12 @@ Sort earthquake data by timestamp
 This script ensures the JSON file is properly sorted by timestamp (newest first)
 """
 
-import json
 import os
 from datetime import datetime
 
+import ndjson_reader
+from atomic_file import atomic_write
+
 def sort_earthquake_data():
     """Sort the earthquake JSON file by timestamp"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,52 +20,40 @@ def sort_earthquake_data():
         return False
     
     print("🔄 Loading earthquake data...")
-    earthquakes = []
     
     try:
-        # Load all earthquake data
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if line:
-                    try:
-                        eq_data = json.loads(line)
-                        earthquakes.append(eq_data)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️  Skipping invalid JSON on line {line_num}: {e}")
+        # Index all earthquake lines (time, byte offset, length), decoded in parallel shards
+        index, errors = ndjson_reader.read_line_index(json_file_path, skip_invalid=True)
+        for offset, error in errors:
+            print(f"⚠️  Skipping invalid JSON at byte {offset}: {error}")
         
-        print(f"📊 Loaded {len(earthquakes)} earthquakes")
+        print(f"📊 Loaded {len(index)} earthquakes")
         
-        if not earthquakes:
+        if not len(index):
             print("❌ No valid earthquake data found")
             return False
         
         # Check current order
         print("🔍 Checking current sort order...")
-        is_sorted = True
-        for i in range(len(earthquakes) - 1):
-            if earthquakes[i].get('time', 0) < earthquakes[i + 1].get('time', 0):
-                is_sorted = False
-                break
+        times = index.times
+        order = range(len(index))
+        is_sorted = all(times[i] >= times[i + 1] for i in range(len(times) - 1))
         
         if is_sorted:
             print("✅ Data is already sorted correctly (newest first)")
         else:
             print("🔄 Sorting earthquakes by timestamp (newest first)...")
-            earthquakes.sort(key=lambda x: x.get('time', 0), reverse=True)
+            order = sorted(order, key=times.__getitem__, reverse=True)
         
         # Show timestamp range
-        if earthquakes:
-            newest_time = datetime.fromtimestamp(earthquakes[0]['time'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-            oldest_time = datetime.fromtimestamp(earthquakes[-1]['time'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-            print(f"📅 Date range: {oldest_time} to {newest_time}")
+        newest_time = datetime.fromtimestamp(times[order[0]] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        oldest_time = datetime.fromtimestamp(times[order[-1]] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"📅 Date range: {oldest_time} to {newest_time}")
         
-        # Write sorted data back
+        # Copy the raw lines in sorted order without exposing a half-written file to readers
         print("💾 Saving sorted data...")
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            for earthquake in earthquakes:
-                json.dump(earthquake, f, separators=(',', ':'))
-                f.write('\n')
+        with atomic_write(json_file_path, 'wb') as f:
+            ndjson_reader.write_lines(f, json_file_path, index, order)
         
         print("✅ Earthquake data sorted and saved successfully!")
         return True
@@ -4,43 +4,45 @@ Update earthquake data with latest weekly data from USGS
 This script fetches the latest week of earthquake data and updates the local JSON file
 """
 
-import json
 import requests
 import os
 from datetime import datetime
 import sys
 
+import ndjson_reader
+from atomic_file import atomic_write
+
 def load_existing_data(json_file_path):
-    """Load existing earthquake data from JSON file"""
-    existing_data = []
+    """
+    Index existing earthquake data in the JSON file.
+    Returns a line index (byte offset, length, time and ID of each record) and the set of IDs;
+    records themselves stay on disk and are copied as raw lines when the file is rewritten.
+    """
+    existing_index = ndjson_reader.LineIndex()
     existing_ids = set()
     
     if os.path.exists(json_file_path):
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        eq_data = json.loads(line)
-                        existing_data.append(eq_data)
-                        # Use a combination of time, lat, lon as ID if no ID exists
-                        eq_id = eq_data.get('id', f"{eq_data.get('time', '')}_{eq_data.get('latitude', '')}_{eq_data.get('longitude', '')}")
-                        existing_ids.add(eq_id)
-            print(f"📊 Loaded {len(existing_data)} existing earthquake records")
+            # Decoded in parallel shards; invalid lines are skipped rather than truncating the catalog
+            existing_index, errors = ndjson_reader.read_line_index(json_file_path, skip_invalid=True)
+            for offset, error in errors:
+                print(f"⚠️  Skipping invalid JSON at byte {offset}: {error}")
+            existing_ids.update(existing_index.ids)
+            print(f"📊 Loaded {len(existing_index)} existing earthquake records")
         except Exception as e:
             print(f"⚠️  Error loading existing data: {e}")
     else:
         print("📂 No existing data file found, will create new one")
     
-    return existing_data, existing_ids
+    return existing_index, existing_ids
 
-def fetch_weekly_usgs_data():
-    """Fetch latest weekly earthquake data from USGS"""
+def fetch_weekly_usgs_data(session=None):
+    """Fetch latest weekly earthquake data from USGS, reusing an HTTP session if given"""
     url = 'https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_week.geojson'
     
     try:
         print(f"🌍 Fetching weekly earthquake data from USGS...")
-        response = requests.get(url, timeout=30)
+        response = (session or requests).get(url, timeout=30)
         response.raise_for_status()
         
         data = response.json()
@@ -95,53 +97,150 @@ def sort_earthquakes_by_time(earthquakes, reverse=True):
     """Sort earthquakes by timestamp (newest first by default)"""
     return sorted(earthquakes, key=lambda x: x.get('time', 0), reverse=reverse)
 
-def update_json_file(json_file_path, existing_data, new_earthquakes):
-    """Update the JSON file with new earthquake data"""
+def select_new_earthquakes(usgs_features, existing_ids):
+    """Convert USGS features and keep the ones in the target region that are not known yet"""
+    new_earthquakes = []
+    duplicate_count = 0
+    filtered_out_count = 0
     
-    print(f"🔄 Merging {len(existing_data)} existing + {len(new_earthquakes)} new earthquakes...")
+    for feature in usgs_features:
+        earthquake = convert_usgs_to_format(feature)
+        earthquake_id = earthquake['id']
+        
+        # Check if earthquake is in target region
+        if not is_in_target_region(earthquake['latitude'], earthquake['longitude']):
+            filtered_out_count += 1
+            continue
+        
+        # Check if this earthquake already exists
+        if earthquake_id not in existing_ids:
+            new_earthquakes.append(earthquake)
+            existing_ids.add(earthquake_id)
+            print(f"✅ New earthquake in target region: M{earthquake['mag']:.1f} - {earthquake['place']}")
+        else:
+            duplicate_count += 1
+    
+    print(f"🔍 Found {len(new_earthquakes)} new earthquakes in target region")
+    print(f"🌍 Filtered out {filtered_out_count} earthquakes outside target region")
+    print(f"⚠️  Skipped {duplicate_count} duplicates")
+    
+    return new_earthquakes
+
+def update_json_file(json_file_path, existing_index, new_earthquakes):
+    """
+    Update the JSON file with new earthquake data.
+    Returns the line index of the rewritten file, or None if writing failed.
+    """
+    
+    print(f"🔄 Merging {len(existing_index)} existing + {len(new_earthquakes)} new earthquakes...")
     
-    # Combine all data
-    all_data = existing_data + new_earthquakes
+    # Combine the times of existing lines and new earthquakes
+    times = list(existing_index.times) + [eq.get('time') or 0 for eq in new_earthquakes]
     
     # Sort by timestamp (newest first) - this is the final sorting stage
     print("🔄 Sorting all earthquakes by timestamp (newest first)...")
-    all_data.sort(key=lambda x: x.get('time', 0), reverse=True)
+    order = sorted(range(len(times)), key=times.__getitem__, reverse=True)
     
     # Debug: Show timestamp range after sorting
-    if all_data:
-        newest_time = datetime.fromtimestamp(all_data[0]['time'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-        oldest_time = datetime.fromtimestamp(all_data[-1]['time'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+    if order:
+        newest_time = datetime.fromtimestamp(times[order[0]] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        oldest_time = datetime.fromtimestamp(times[order[-1]] / 1000).strftime('%Y-%m-%d %H:%M:%S')
         print(f"📅 Date range after sorting: {oldest_time} to {newest_time}")
     
-    # Write sorted data back to file
+    # Existing records are copied as raw lines and new ones are merged in; the result goes
+    # to a temporary file that atomically replaces the old one, so clients reading
+    # data.json never see a half-written file
     try:
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            for earthquake in all_data:
-                json.dump(earthquake, f, separators=(',', ':'))
-                f.write('\n')
+        with atomic_write(json_file_path, 'wb') as f:
+            new_index = ndjson_reader.write_lines(f, json_file_path, existing_index, order, new_earthquakes)
         
         print(f"💾 Successfully updated {json_file_path}")
-        print(f"📈 Total earthquakes in dataset: {len(all_data)}")
+        print(f"📈 Total earthquakes in dataset: {len(new_index)}")
         print(f"🆕 New earthquakes added: {len(new_earthquakes)}")
         print("✅ All data sorted by timestamp (newest first)")
         
-        return True
+        return new_index
         
     except Exception as e:
         print(f"❌ Error writing to file: {e}")
+        return None
+
+def _import_into_store(earthquake_store, conn, json_file_path, seed):
+    inserted, updated, errors = earthquake_store.import_json(conn, json_file_path, seed=seed)
+    for line_num, error in errors:
+        print(f"⚠️  Skipping invalid JSON on line {line_num}: {error}")
+    print(f"📥 Imported {inserted} new and {updated} revised earthquake records from {json_file_path}")
+
+def update_store(db_path, json_file_path, usgs_features):
+    """
+    Upsert new earthquakes into the SQLite catalog and export data.json from it.
+    The database only needs the week's new rows, but data.json is still rewritten
+    in full whenever the catalog changes, since the website reads the whole file.
+    """
+    import earthquake_store
+    
+    print(f"🗄️  Using SQLite catalog: {db_path}")
+    conn = earthquake_store.connect(db_path)
+    try:
+        # Seed the database from the existing data.json on first use; the seed is
+        # all-or-nothing, so a failed seed is simply retried on the next run
+        if not earthquake_store.is_seeded(conn):
+            if os.path.exists(json_file_path):
+                _import_into_store(earthquake_store, conn, json_file_path, seed=True)
+            else:
+                earthquake_store.mark_seeded(conn)
+        # Pick up records other writers (the JSON-mode updater, a git pull, eqdata convert)
+        # added to data.json, so the export below does not drop them
+        elif earthquake_store.json_changed(conn, json_file_path):
+            print(f"🔄 {json_file_path} changed outside the catalog, re-importing it...")
+            _import_into_store(earthquake_store, conn, json_file_path, seed=False)
+        
+        earthquakes = []
+        filtered_out_count = 0
+        for feature in usgs_features:
+            earthquake = convert_usgs_to_format(feature)
+            if not is_in_target_region(earthquake['latitude'], earthquake['longitude']):
+                filtered_out_count += 1
+                continue
+            earthquakes.append(earthquake)
+        
+        inserted, updated = earthquake_store.upsert_earthquakes(conn, earthquakes)
+        print(f"🔍 Found {inserted} new and {updated} revised earthquakes in target region")
+        print(f"🌍 Filtered out {filtered_out_count} earthquakes outside target region")
+        
+        if inserted or updated or not os.path.exists(json_file_path):
+            count = earthquake_store.export_json(conn, json_file_path)
+            print(f"💾 Exported {count} earthquakes to {json_file_path}")
+        else:
+            print("ℹ️  No changes, data.json left as is")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error updating SQLite catalog: {e}")
         return False
+    finally:
+        conn.close()
 
 def main():
     """Main function to update earthquake data"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
     json_file_path = os.path.join(script_dir, 'data.json')
+    db_path = os.environ.get('EARTHQUAKE_DB')
     
     print("🌍 Historical Earthquakes Data Updater")
     print("=" * 50)
     print(f"📅 Update time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    # Optional SQLite backend: only new rows are written, no full catalog load
+    if db_path:
+        usgs_features = fetch_weekly_usgs_data()
+        if not usgs_features:
+            print("❌ Failed to fetch new data, keeping existing dataset")
+            return False
+        return update_store(db_path, json_file_path, usgs_features)
+    
     # Load existing data
-    existing_data, existing_ids = load_existing_data(json_file_path)
+    existing_index, existing_ids = load_existing_data(json_file_path)
     
     # Fetch new weekly data
     usgs_features = fetch_weekly_usgs_data()
@@ -150,35 +249,12 @@ def main():
         return False
     
     # Process new earthquakes with geographic filtering
-    new_earthquakes = []
-    duplicate_count = 0
-    filtered_out_count = 0
-    
-    for feature in usgs_features:
-        earthquake = convert_usgs_to_format(feature)
-        earthquake_id = earthquake['id']
-        
-        # Check if earthquake is in target region
-        if not is_in_target_region(earthquake['latitude'], earthquake['longitude']):
-            filtered_out_count += 1
-            continue
-        
-        # Check if this earthquake already exists
-        if earthquake_id not in existing_ids:
-            new_earthquakes.append(earthquake)
-            existing_ids.add(earthquake_id)
-            print(f"✅ New earthquake in target region: M{earthquake['mag']:.1f} - {earthquake['place']}")
-        else:
-            duplicate_count += 1
-    
-    print(f"🔍 Found {len(new_earthquakes)} new earthquakes in target region")
-    print(f"🌍 Filtered out {filtered_out_count} earthquakes outside target region")
-    print(f"⚠️  Skipped {duplicate_count} duplicates")
+    new_earthquakes = select_new_earthquakes(usgs_features, existing_ids)
     
     # Update the JSON file (always re-sort and save to ensure proper ordering)
     if new_earthquakes:
-        success = update_json_file(json_file_path, existing_data, new_earthquakes)
-        if success:
+        new_index = update_json_file(json_file_path, existing_index, new_earthquakes)
+        if new_index is not None:
             print("🎉 Data update completed successfully!")
             return True
         else:
@@ -187,8 +263,8 @@ def main():
     else:
         # Even if no new earthquakes, re-sort existing data to ensure proper order
         print("ℹ️  No new earthquakes to add, but re-sorting existing data...")
-        success = update_json_file(json_file_path, existing_data, [])
-        if success:
+        new_index = update_json_file(json_file_path, existing_index, [])
+        if new_index is not None:
             print("✅ Existing data re-sorted successfully!")
             return True
         else: